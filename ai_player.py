@@ -1,9 +1,15 @@
 """
 AI Player module - Implements AI opponents with different difficulty levels
 """
+import heapq
 import random
-from typing import List, Optional
-from game_engine import GameEngine, Move, Player, Marble, TRACK_SIZE, HOME_ENTRIES, HOME_SIZE, SAFE_SPOTS
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from game_engine import GameEngine, MoveTuple, Player, Marble, TRACK_SIZE, HOME_ENTRIES, HOME_SIZE, _SAFE_MASK
+
+# Maximum number of boards each AIPlayer keeps scores for
+SCORE_CACHE_SIZE = 4096
 
 
 class AIPlayer:
@@ -11,8 +17,14 @@ class AIPlayer:
 
     def __init__(self, difficulty: str = "medium"):
         self.difficulty = difficulty
-
-    def choose_move(self, engine: GameEngine, valid_moves: List[Move]) -> Optional[Move]:
+        self._rng = random.Random()
+        # Move scores keyed by board hash, shared across games since the
+        # same board always scores the same way
+        self._score_cache: "OrderedDict[int, Dict[Tuple[str, int], float]]" = OrderedDict()
+        # Pooled instances are shared by the AI executor threads
+        self._score_cache_lock = threading.Lock()
+
+    def choose_move(self, engine: GameEngine, valid_moves: List[MoveTuple]) -> Optional[MoveTuple]:
         """Select a move based on difficulty level"""
         if not valid_moves:
             return None
@@ -24,166 +36,203 @@ class AIPlayer:
         else:  # hard
             return self._hard_move(engine, valid_moves)
 
-    def _easy_move(self, valid_moves: List[Move]) -> Move:
+    def _easy_move(self, valid_moves: List[MoveTuple]) -> MoveTuple:
         """Easy AI: Random valid move"""
-        return random.choice(valid_moves)
+        if len(valid_moves) == 1:
+            return valid_moves[0]
+        return self._rng.choice(valid_moves)
 
-    def _medium_move(self, engine: GameEngine, valid_moves: List[Move]) -> Move:
+    def _medium_move(self, engine: GameEngine, valid_moves: List[MoveTuple]) -> MoveTuple:
         """Medium AI: Prioritize captures > enter home > exit start > advance"""
-        scored_moves = []
-
-        for move in valid_moves:
-            score = self._score_move(engine, move)
-            scored_moves.append((move, score))
+        scored_moves = self._score_moves(engine, valid_moves)
 
-        # Sort by score descending
-        scored_moves.sort(key=lambda x: x[1], reverse=True)
+        # Only the two best scores matter, no need to sort everything
+        top_two = heapq.nlargest(2, scored_moves, key=lambda x: x[1])
+        best_move, top_score = top_two[0]
 
-        # Add some randomness - pick from top 2 if close scores
-        if len(scored_moves) > 1:
-            top_score = scored_moves[0][1]
-            close_moves = [m for m, s in scored_moves if s >= top_score - 10]
-            return random.choice(close_moves)
+        # Dominant move (or the only one): nothing to randomize over
+        if len(top_two) == 1 or top_two[1][1] < top_score - 10:
+            return best_move
 
-        return scored_moves[0][0]
+        # Add some randomness - pick from top moves if close scores
+        close_moves = [m for m, s in scored_moves if s >= top_score - 10]
+        return self._rng.choice(close_moves)
 
-    def _hard_move(self, engine: GameEngine, valid_moves: List[Move]) -> Move:
+    def _hard_move(self, engine: GameEngine, valid_moves: List[MoveTuple]) -> MoveTuple:
         """Hard AI: Strategic with look-ahead and defensive play"""
-        scored_moves = []
+        scored_moves = self._score_moves(engine, valid_moves, advanced=True)
+
+        # Highest score wins (first one on ties)
+        return max(scored_moves, key=lambda x: x[1])[0]
+
+    def _score_moves(self, engine: GameEngine, valid_moves: List[MoveTuple],
+                     advanced: bool = False) -> List[Tuple[MoveTuple, float]]:
+        """Score all valid moves, reusing scores for previously seen boards.
+
+        advanced adds the hard AI's defensive and blocking terms.
+        """
+        key = engine.zobrist_hash()
+        with self._score_cache_lock:
+            cached = self._score_cache.get(key)
+            if cached is not None and len(cached) == len(valid_moves):
+                scored_moves = [(move, cached.get((move.marble_id, move.to_position)))
+                                for move in valid_moves]
+                # Guard against hash collisions before trusting the cached scores
+                if all(score is not None for _, score in scored_moves):
+                    self._score_cache.move_to_end(key)
+                    return scored_moves
+
+        base_scores = self._score_moves_batch(engine, valid_moves)
+        if advanced:
+            # Opponent threats and paths depend only on the board, not the
+            # candidate move, so build them once per turn instead of per move
+            player_id = engine.current_player
+            threat_count = self._build_threat_count(engine, player_id)
+            block_paths = self._build_block_paths(engine, player_id)
+            scored_moves = [(move, self._score_move_advanced(engine, move, base_score, player_id,
+                                                             threat_count, block_paths))
+                            for move, base_score in zip(valid_moves, base_scores)]
+        else:
+            scored_moves = list(zip(valid_moves, base_scores))
+
+        scores = {(move.marble_id, move.to_position): score for move, score in scored_moves}
+        with self._score_cache_lock:
+            self._score_cache[key] = scores
+            if len(self._score_cache) > SCORE_CACHE_SIZE:
+                self._score_cache.popitem(last=False)
+
+        return scored_moves
+
+    def _score_moves_batch(self, engine: GameEngine,
+                           valid_moves: List[MoveTuple]) -> List[float]:
+        """Score all moves for medium difficulty in a single pass"""
+        # Every valid move belongs to the current player, so look it up once
+        marbles = engine.marbles
+        home_start = HOME_ENTRIES[engine.get_current_player().color]
+        scores = []
 
         for move in valid_moves:
-            score = self._score_move_advanced(engine, move)
-            scored_moves.append((move, score))
-
-        # Sort by score descending
-        scored_moves.sort(key=lambda x: x[1], reverse=True)
-        return scored_moves[0][0]
-
-    def _score_move(self, engine: GameEngine, move: Move) -> float:
-        """Score a move for medium difficulty"""
-        score = 0.0
-        marble = engine.marbles[move.marble_id]
-        player = engine.players[marble.player_id]
-
-        # Entering home stretch
-        home_start = HOME_ENTRIES[player.color]
-        if move.to_position >= home_start:
-            # Higher score the closer to final home position
-            home_pos = move.to_position - home_start
-            score += 100 + (home_pos * 25)
-
-        # Capturing opponent
-        if move.captured_marble_id:
-            captured = engine.marbles[move.captured_marble_id]
-            # More valuable to capture marbles further along
-            if captured.position >= 0:
-                score += 50 + (captured.position * 0.5)
-            else:
-                score += 50
-
-        # Exiting start area
-        if move.is_entering_track:
-            score += 40
-
-        # Advancing on track
-        if move.from_position >= 0 and move.to_position < home_start:
-            # Prefer moving marbles that are behind
-            progress = move.to_position - move.from_position
-            if progress < 0:
-                progress += TRACK_SIZE  # Handle wrap-around
-            score += progress
-
-        # Moving to safe spot
-        if move.to_position in SAFE_SPOTS:
-            score += 15
-
-        return score
-
-    def _score_move_advanced(self, engine: GameEngine, move: Move) -> float:
+            score = 0.0
+            to_position = move.to_position
+            from_position = move.from_position
+
+            # Entering home stretch
+            if to_position >= home_start:
+                # Higher score the closer to final home position
+                home_pos = to_position - home_start
+                score += 100 + (home_pos * 25)
+
+            # Capturing opponent
+            if move.captured_marble_id:
+                captured_position = marbles[move.captured_marble_id].position
+                # More valuable to capture marbles further along
+                if captured_position >= 0:
+                    score += 50 + (captured_position * 0.5)
+                else:
+                    score += 50
+
+            # Exiting start area
+            if move.is_entering_track:
+                score += 40
+
+            # Advancing on track
+            if from_position >= 0 and to_position < home_start:
+                # Prefer moving marbles that are behind
+                progress = to_position - from_position
+                if progress < 0:
+                    progress += TRACK_SIZE  # Handle wrap-around
+                score += progress
+
+            # Moving to safe spot
+            if (_SAFE_MASK >> to_position) & 1:
+                score += 15
+
+            scores.append(score)
+
+        return scores
+
+    def _score_move_advanced(self, engine: GameEngine, move: MoveTuple,
+                             base_score: float, player_id: int,
+                             threat_count: List[int],
+                             block_paths: List[FrozenSet[int]]) -> float:
         """Advanced scoring for hard difficulty with defensive consideration"""
-        score = self._score_move(engine, move)
-        marble = engine.marbles[move.marble_id]
-        player = engine.players[marble.player_id]
+        score = base_score
 
         # Defensive: Avoid positions where opponent can capture us
-        if move.to_position < TRACK_SIZE and move.to_position not in SAFE_SPOTS:
-            danger_score = self._calculate_danger(engine, move.to_position, player.id)
+        if move.to_position < TRACK_SIZE and not (_SAFE_MASK >> move.to_position) & 1:
+            danger_score = self._calculate_danger(threat_count, move.to_position)
             score -= danger_score
 
         # Offensive: Prefer positions that block opponents
-        block_score = self._calculate_blocking_value(engine, move.to_position, player.id)
+        block_score = self._calculate_blocking_value(block_paths, move.to_position)
         score += block_score
 
         # Prefer spreading marbles out rather than clustering
-        spread_score = self._calculate_spread_value(engine, move, player.id)
+        spread_score = self._calculate_spread_value(engine, move, player_id)
         score += spread_score
 
         return score
 
-    def _calculate_danger(self, engine: GameEngine, position: int,
-                          player_id: int) -> float:
-        """Calculate how dangerous a position is (can opponent capture us?)"""
-        danger = 0.0
+    def _build_threat_count(self, engine: GameEngine, player_id: int) -> List[int]:
+        """Count opponent marbles that can reach each track position in one roll"""
+        threat_count = [0] * TRACK_SIZE
 
-        for other_player in engine.players:
-            if other_player.id == player_id:
-                continue
+        for marble_pos, owner in zip(engine.positions, engine.owners):
+            if owner == player_id or marble_pos < 0:
+                continue  # Our own marble, or in start and can't threaten
 
-            for marble in other_player.marbles:
-                if marble.position < 0:
-                    continue  # In start, can't threaten
+            for dice in range(1, 7):
+                threat_count[(marble_pos + dice) % TRACK_SIZE] += 1
 
-                # Check if opponent could reach this position with dice 1-6
-                for dice in range(1, 7):
-                    potential_pos = (marble.position + dice) % TRACK_SIZE
-                    if potential_pos == position:
-                        # Weight by probability (1/6 for each dice value)
-                        danger += 10 * (1/6)
+        return threat_count
 
-        return danger
+    def _calculate_danger(self, threat_count: List[int], position: int) -> float:
+        """Calculate how dangerous a position is (can opponent capture us?)"""
+        # Weight each threat by probability (1/6 for each dice value)
+        return threat_count[position] * 10 * (1/6)
 
-    def _calculate_blocking_value(self, engine: GameEngine, position: int,
-                                  player_id: int) -> float:
-        """Calculate value of blocking opponent's path"""
-        block_value = 0.0
+    def _build_block_paths(self, engine: GameEngine, player_id: int) -> List[FrozenSet[int]]:
+        """Collect the track squares each opponent marble must cross to reach home"""
+        block_paths = []
 
-        for other_player in engine.players:
-            if other_player.id == player_id:
-                continue
+        # Rough start position of each player
+        other_starts = [(HOME_ENTRIES[p.color] - 56) % TRACK_SIZE for p in engine.players]
 
-            for marble in other_player.marbles:
-                if marble.position < 0:
-                    continue
+        for marble_pos, owner in zip(engine.positions, engine.owners):
+            if owner == player_id or marble_pos < 0:
+                continue
 
-                # Check if we're blocking their path to home
-                other_home_entry = HOME_ENTRIES[other_player.color]
-                other_start = (other_home_entry - 56) % TRACK_SIZE  # Rough start position
+            # Only opponent marbles approaching their home can be blocked
+            distance_to_home = (other_starts[owner] - marble_pos) % TRACK_SIZE
+            if 0 < distance_to_home < 14:
+                block_paths.append(frozenset(
+                    (marble_pos + step) % TRACK_SIZE
+                    for step in range(1, distance_to_home + 1)
+                ))
 
-                # If opponent marble is approaching their home and we block
-                distance_to_home = (other_start - marble.position) % TRACK_SIZE
-                if 0 < distance_to_home < 14:
-                    # Check if position is in their path
-                    path_pos = marble.position
-                    for _ in range(distance_to_home):
-                        path_pos = (path_pos + 1) % TRACK_SIZE
-                        if path_pos == position:
-                            block_value += 5
-                            break
+        return block_paths
 
-        return block_value
+    def _calculate_blocking_value(self, block_paths: List[FrozenSet[int]],
+                                  position: int) -> float:
+        """Calculate value of blocking opponent's path"""
+        return 5.0 * sum(1 for path in block_paths if position in path)
 
-    def _calculate_spread_value(self, engine: GameEngine, move: Move,
+    def _calculate_spread_value(self, engine: GameEngine, move: MoveTuple,
                                 player_id: int) -> float:
         """Prefer spreading marbles out for more move options"""
-        player = engine.players[player_id]
-        spread_value = 0.0
+        # Only a marble leaving start changes the spread, skip counting otherwise
+        if not move.is_entering_track:
+            return 0.0
 
         # Count marbles in start - penalize having many in start
-        marbles_in_start = sum(1 for m in player.marbles if m.position == -1)
-        if move.is_entering_track and marbles_in_start > 2:
-            spread_value += 10  # Encourage getting marbles out
+        if engine.players[player_id].marbles_in_start() > 2:
+            return 10.0  # Encourage getting marbles out
+
+        return 0.0
+
 
-        return spread_value
+# One shared AIPlayer per difficulty, so their score caches persist across turns
+_AI_POOL: Dict[str, AIPlayer] = {}
 
 
 def get_ai_move(engine: GameEngine) -> Optional[dict]:
@@ -193,7 +242,8 @@ def get_ai_move(engine: GameEngine) -> Optional[dict]:
         return None
 
     # Roll dice first
-    dice_value, valid_moves = engine.roll_dice()
+    # The AI only needs the move fields, so skip building Move dataclasses
+    dice_value, valid_moves = engine.roll_dice(as_dataclass=False)
 
     if not valid_moves:
         return {
@@ -203,7 +253,9 @@ def get_ai_move(engine: GameEngine) -> Optional[dict]:
         }
 
     # Choose move based on difficulty
-    ai = AIPlayer(player.ai_difficulty)
+    ai = _AI_POOL.get(player.ai_difficulty)
+    if ai is None:
+        ai = _AI_POOL[player.ai_difficulty] = AIPlayer(player.ai_difficulty)
     chosen_move = ai.choose_move(engine, valid_moves)
 
     if chosen_move:
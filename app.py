@@ -2,7 +2,12 @@
 Marbles Game - Flask Application
 Main entry point with API routes
 """
-from flask import Flask, render_template, jsonify, request
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from flask import Flask, Response, render_template, request
 from flask_cors import CORS
 from game_engine import GameEngine
 from ai_player import get_ai_move
@@ -13,6 +18,12 @@ app = Flask(__name__,
             template_folder='templates')
 CORS(app)
 
+
+def json_response(data) -> Response:
+    """Build a JSON response, serialized with orjson"""
+    return Response(orjson.dumps(data), mimetype="application/json")
+
+
 # In-memory game engines (for active games)
 active_games = {}
 
@@ -29,11 +40,94 @@ def get_engine(game_id: str) -> GameEngine:
     return active_games[game_id]
 
 
+# Per-game locks keep AI turns, human turns and the flusher from touching
+# the same engine at once
+_game_locks = {}
+
+
+def get_game_lock(game_id: str) -> threading.Lock:
+    """Get the lock serializing turns for a game"""
+    return _game_locks.setdefault(game_id, threading.Lock())
+
+
+# Write-behind cache: engines with unsaved changes, flushed in batches
+FLUSH_INTERVAL = 0.1  # seconds
+_dirty = {}
+_dirty_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+
 def save_engine(game_id: str, engine: GameEngine):
-    """Save engine state to database"""
-    state = engine.get_state()
-    status = "finished" if engine.status == "finished" else "active"
-    db.update_game(game_id, state, status, engine.winner)
+    """Mark engine state as changed; the flusher writes it to the database"""
+    with _dirty_lock:
+        _dirty[game_id] = engine
+
+
+def flush_engines(game_id: str = None):
+    """Write pending engine states to the database (one game or all)"""
+    # One flush at a time, so an older snapshot can never commit after a newer one
+    with _flush_lock:
+        with _dirty_lock:
+            if game_id is None:
+                pending = list(_dirty.items())
+                _dirty.clear()
+            elif game_id in _dirty:
+                pending = [(game_id, _dirty.pop(game_id))]
+            else:
+                pending = []
+
+        updates = []
+        for gid, engine in pending:
+            # Snapshot under the game lock so a half-applied move is never saved
+            with get_game_lock(gid):
+                updates.append((gid, engine.get_state(),
+                                "finished" if engine.status == "finished" else "active",
+                                engine.winner))
+
+        if updates:
+            try:
+                db.update_games(updates)
+            except Exception:
+                # Re-queue for the next flush, unless a newer change already is
+                with _dirty_lock:
+                    for gid, engine in pending:
+                        _dirty.setdefault(gid, engine)
+                raise
+
+
+def _flush_loop():
+    """Background flusher for the write-behind cache"""
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush_engines()
+        except Exception:
+            app.logger.exception("Failed to flush game state")
+
+
+threading.Thread(target=_flush_loop, daemon=True).start()
+atexit.register(flush_engines)
+
+
+# Background AI turns: clients start one with POST /ai-turn, then poll
+# GET /ai-status for the result.
+_ai_executor = ThreadPoolExecutor(max_workers=4)
+_ai_tasks = {}
+_ai_tasks_lock = threading.Lock()
+
+
+def _run_ai_turn(game_id: str, engine: GameEngine) -> dict:
+    """Play the AI's turn (runs on the AI executor)"""
+    with get_game_lock(game_id):
+        result = get_ai_move(engine)
+        if result is None:
+            raise ValueError("Not AI's turn")
+        save_engine(game_id, engine)
+
+        return {
+            **result,
+            "state": engine.get_state()
+        }
 
 
 # =============================================================================
@@ -49,8 +143,8 @@ def index():
 @app.route('/game/<game_id>')
 def game_page(game_id):
     """Game page"""
-    game = db.get_game(game_id)
-    if not game:
+    # Active games are already in memory, no need to read the database
+    if game_id not in active_games and not db.get_game(game_id):
         return render_template('index.html', error="Game not found")
     return render_template('game.html', game_id=game_id)
 
@@ -91,7 +185,7 @@ def create_game():
     game_id = db.create_game(state)
     active_games[game_id] = engine
 
-    return jsonify({
+    return json_response({
         "game_id": game_id,
         "state": state
     })
@@ -102,9 +196,11 @@ def get_game(game_id):
     """Get current game state"""
     engine = get_engine(game_id)
     if not engine:
-        return jsonify({"error": "Game not found"}), 404
+        return json_response({"error": "Game not found"}), 404
+
+    flush_engines(game_id)
 
-    return jsonify({
+    return json_response({
         "game_id": game_id,
         "state": engine.get_state()
     })
@@ -115,19 +211,20 @@ def roll_dice(game_id):
     """Roll dice for current player"""
     engine = get_engine(game_id)
     if not engine:
-        return jsonify({"error": "Game not found"}), 404
+        return json_response({"error": "Game not found"}), 404
 
     try:
-        dice_value, valid_moves = engine.roll_dice()
-        save_engine(game_id, engine)
-
-        return jsonify({
-            "dice_value": dice_value,
-            "valid_moves": [m.to_dict() for m in valid_moves],
-            "state": engine.get_state()
-        })
+        with get_game_lock(game_id):
+            dice_value, valid_moves = engine.roll_dice()
+            save_engine(game_id, engine)
+
+            return json_response({
+                "dice_value": dice_value,
+                "valid_moves": [m.to_dict() for m in valid_moves],
+                "state": engine.get_state()
+            })
     except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return json_response({"error": str(e)}), 400
 
 
 @app.route('/api/game/<game_id>/move', methods=['POST'])
@@ -135,43 +232,73 @@ def make_move(game_id):
     """Make a move"""
     engine = get_engine(game_id)
     if not engine:
-        return jsonify({"error": "Game not found"}), 404
+        return json_response({"error": "Game not found"}), 404
 
     data = request.get_json()
     marble_id = data.get('marble_id')
     to_position = data.get('to_position')
 
     if marble_id is None or to_position is None:
-        return jsonify({"error": "Missing marble_id or to_position"}), 400
+        return json_response({"error": "Missing marble_id or to_position"}), 400
 
     try:
-        result = engine.make_move(marble_id, to_position)
-        save_engine(game_id, engine)
-
-        return jsonify({
-            **result,
-            "state": engine.get_state()
-        })
+        with get_game_lock(game_id):
+            result = engine.make_move(marble_id, to_position)
+            save_engine(game_id, engine)
+
+            return json_response({
+                **result,
+                "state": engine.get_state()
+            })
     except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return json_response({"error": str(e)}), 400
 
 
 @app.route('/api/game/<game_id>/ai-turn', methods=['POST'])
 def ai_turn(game_id):
-    """Execute AI player's turn"""
+    """Start AI player's turn in the background; poll ai-status for the result"""
     engine = get_engine(game_id)
     if not engine:
-        return jsonify({"error": "Game not found"}), 404
+        return json_response({"error": "Game not found"}), 404
 
-    if not engine.is_ai_turn():
-        return jsonify({"error": "Not AI's turn"}), 400
+    with _ai_tasks_lock:
+        task = _ai_tasks.get(game_id)
+        if task and not task.done():
+            return json_response({"status": "pending"}), 202
+        if task:
+            # A finished turn nobody collected (e.g. the page was reloaded) is
+            # already applied and saved; drop its stale result
+            del _ai_tasks[game_id]
 
-    result = get_ai_move(engine)
-    save_engine(game_id, engine)
+        if not engine.is_ai_turn():
+            return json_response({"error": "Not AI's turn"}), 400
 
-    return jsonify({
-        **result,
-        "state": engine.get_state()
+        _ai_tasks[game_id] = _ai_executor.submit(_run_ai_turn, game_id, engine)
+
+    return json_response({"status": "pending"}), 202
+
+
+@app.route('/api/game/<game_id>/ai-status', methods=['GET'])
+def ai_status(game_id):
+    """Get the result of the AI turn started by ai-turn"""
+    with _ai_tasks_lock:
+        task = _ai_tasks.get(game_id)
+        if not task:
+            return json_response({"error": "No AI turn in progress"}), 404
+
+        if not task.done():
+            return json_response({"status": "pending"}), 202
+
+        del _ai_tasks[game_id]
+
+    try:
+        result = task.result()
+    except ValueError as e:
+        return json_response({"error": str(e)}), 400
+
+    return json_response({
+        "status": "done",
+        **result
     })
 
 
@@ -181,10 +308,17 @@ def delete_game(game_id):
     if game_id in active_games:
         del active_games[game_id]
 
+    # Drop any pending write so the flusher can't race the delete
+    with _dirty_lock:
+        _dirty.pop(game_id, None)
+    with _ai_tasks_lock:
+        _ai_tasks.pop(game_id, None)
+    _game_locks.pop(game_id, None)
+
     deleted = db.delete_game(game_id)
     if deleted:
-        return jsonify({"success": True})
-    return jsonify({"error": "Game not found"}), 404
+        return json_response({"success": True})
+    return json_response({"error": "Game not found"}), 404
 
 
 # =============================================================================
@@ -194,4 +328,4 @@ def delete_game(game_id):
 if __name__ == '__main__':
     print("Starting Marbles Game Server...")
     print("Open http://localhost:5000 in your browser")
-    app.run(debug=True, port=5000)
+    app.run(port=5000, threaded=True)
@@ -1,25 +1,83 @@
 """
 Database module - SQLite setup and game persistence
 """
+import atexit
+import os
 import sqlite3
-import json
-import uuid
-from datetime import datetime
+import threading
+import time
+import weakref
+import msgpack
+import orjson
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 # Database path
 DB_PATH = Path(__file__).parent / "instance" / "marbles.db"
 
+# Short-lived read-through cache of game rows: game_id -> (fetched_at, row)
+GAME_CACHE_TTL = 2.0  # seconds
+GAME_CACHE_SIZE = 256
+_game_row_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+# One connection per thread, reused across requests and closed when the
+# thread exits. Keyed by id(conn) so the registry holds no thread references.
+_tls = threading.local()
+_connections: Dict[int, sqlite3.Connection] = {}
+_connections_lock = threading.Lock()
+
 
 def get_db_connection():
-    """Get database connection with row factory"""
-    DB_PATH.parent.mkdir(exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
+    """Get this thread's database connection with row factory"""
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        DB_PATH.parent.mkdir(exist_ok=True)
+        # Autocommit mode: each statement commits on its own
+        conn = sqlite3.connect(str(DB_PATH), check_same_thread=False,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _tls.conn = conn
+        with _connections_lock:
+            _connections[id(conn)] = conn
+        # Per-request threads (app.run(threaded=True)) would otherwise leave
+        # their connection open until shutdown
+        weakref.finalize(threading.current_thread(), _close_connection, id(conn)).atexit = False
     return conn
 
 
+def _close_connection(key: int):
+    """Close a connection once the thread that owned it is gone"""
+    with _connections_lock:
+        conn = _connections.pop(key, None)
+    if conn is not None:
+        conn.close()
+
+
+@atexit.register
+def close_connections():
+    """Close every remaining connection on interpreter shutdown"""
+    with _connections_lock:
+        conns = list(_connections.values())
+        _connections.clear()
+    for conn in conns:
+        conn.close()
+
+
+def _pack_state(state: Dict[str, Any]) -> bytes:
+    """Encode game state for the state column"""
+    return msgpack.packb(state, use_bin_type=True)
+
+
+def _unpack_state(data) -> Dict[str, Any]:
+    """Decode the state column (msgpack, or JSON text from older databases)"""
+    if isinstance(data, str):
+        return orjson.loads(data)
+    return msgpack.unpackb(data, raw=False)
+
+
 def init_db():
     """Initialize database tables"""
     conn = get_db_connection()
@@ -28,7 +86,7 @@ def init_db():
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS games (
             id TEXT PRIMARY KEY,
-            state TEXT NOT NULL,
+            state BLOB NOT NULL,
             status TEXT DEFAULT 'active',
             winner INTEGER,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -36,89 +94,120 @@ def init_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
-
 
 def create_game(state: Dict[str, Any]) -> str:
     """Create a new game and return its ID"""
-    game_id = str(uuid.uuid4())[:8]  # Short UUID
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "INSERT INTO games (id, state, status) VALUES (?, ?, ?)",
-        (game_id, json.dumps(state), "active")
-    )
+    while True:
+        game_id = os.urandom(4).hex()  # Short random ID
+        try:
+            cursor.execute(
+                "INSERT INTO games (id, state, status) VALUES (?, ?, ?)",
+                (game_id, _pack_state(state), "active")
+            )
+            break
+        except sqlite3.IntegrityError:
+            continue  # ID already taken, draw another
 
-    conn.commit()
-    conn.close()
     return game_id
 
 
 def get_game(game_id: str) -> Optional[Dict[str, Any]]:
     """Get game by ID"""
+    now = time.monotonic()
+    cached = _game_row_cache.get(game_id)
+    if cached and now - cached[0] < GAME_CACHE_TTL:
+        return cached[1]
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM games WHERE id = ?", (game_id,))
     row = cursor.fetchone()
-    conn.close()
 
     if row:
-        return {
+        game = {
             "id": row["id"],
-            "state": json.loads(row["state"]),
+            "state": _unpack_state(row["state"]),
             "status": row["status"],
             "winner": row["winner"],
             "created_at": row["created_at"],
             "updated_at": row["updated_at"]
         }
+        if len(_game_row_cache) >= GAME_CACHE_SIZE:
+            # Drop expired rows before growing the cache further
+            for gid, (fetched_at, _) in list(_game_row_cache.items()):
+                if now - fetched_at >= GAME_CACHE_TTL:
+                    _game_row_cache.pop(gid, None)
+        _game_row_cache[game_id] = (now, game)
+        return game
     return None
 
 
 def update_game(game_id: str, state: Dict[str, Any], status: str = None,
                 winner: int = None):
     """Update game state"""
+    _game_row_cache.pop(game_id, None)
     conn = get_db_connection()
     cursor = conn.cursor()
 
     if status and winner is not None:
         cursor.execute(
             """UPDATE games
-               SET state = ?, status = ?, winner = ?, updated_at = ?
+               SET state = ?, status = ?, winner = ?, updated_at = CURRENT_TIMESTAMP
                WHERE id = ?""",
-            (json.dumps(state), status, winner, datetime.now(), game_id)
+            (_pack_state(state), status, winner, game_id)
         )
     elif status:
         cursor.execute(
             """UPDATE games
-               SET state = ?, status = ?, updated_at = ?
+               SET state = ?, status = ?, updated_at = CURRENT_TIMESTAMP
                WHERE id = ?""",
-            (json.dumps(state), status, datetime.now(), game_id)
+            (_pack_state(state), status, game_id)
         )
     else:
         cursor.execute(
             """UPDATE games
-               SET state = ?, updated_at = ?
+               SET state = ?, updated_at = CURRENT_TIMESTAMP
                WHERE id = ?""",
-            (json.dumps(state), datetime.now(), game_id)
+            (_pack_state(state), game_id)
         )
 
-    conn.commit()
-    conn.close()
+
+def update_games(updates: List[Tuple[str, Dict[str, Any], str, Optional[int]]]):
+    """Update several games' state, status and winner in one transaction"""
+    for game_id, _, _, _ in updates:
+        _game_row_cache.pop(game_id, None)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("BEGIN")
+    try:
+        cursor.executemany(
+            """UPDATE games
+               SET state = ?, status = ?, winner = COALESCE(?, winner),
+                   updated_at = CURRENT_TIMESTAMP
+               WHERE id = ?""",
+            [(_pack_state(state), status, winner, game_id)
+             for game_id, state, status, winner in updates]
+        )
+    except Exception:
+        conn.rollback()
+        raise
+    cursor.execute("COMMIT")
 
 
 def delete_game(game_id: str) -> bool:
     """Delete a game"""
+    _game_row_cache.pop(game_id, None)
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("DELETE FROM games WHERE id = ?", (game_id,))
     deleted = cursor.rowcount > 0
 
-    conn.commit()
-    conn.close()
     return deleted
 
 
@@ -133,7 +222,6 @@ def get_all_games(limit: int = 10) -> list:
         (limit,)
     )
     rows = cursor.fetchall()
-    conn.close()
 
     return [dict(row) for row in rows]
 
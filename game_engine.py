@@ -2,16 +2,23 @@
 Marbles Game Engine - Core game rules and board logic for Aggravation/Trouble
 """
 import random
-from typing import List, Dict, Optional, Tuple
+from array import array
+from functools import lru_cache
+from typing import List, Dict, NamedTuple, Optional, Tuple, Union
 from dataclasses import dataclass, field
-from enum import Enum
+from enum import IntEnum
 
 
-class PlayerColor(Enum):
-    RED = "red"
-    BLUE = "blue"
-    GREEN = "green"
-    YELLOW = "yellow"
+class PlayerColor(IntEnum):
+    RED = 0
+    BLUE = 1
+    GREEN = 2
+    YELLOW = 3
+
+
+# Serialized color names, indexed by PlayerColor
+_COLOR_NAMES = ("red", "blue", "green", "yellow")
+_COLOR_NAME_TO_ENUM = {name: PlayerColor(i) for i, name in enumerate(_COLOR_NAMES)}
 
 
 # Board configuration
@@ -37,17 +44,63 @@ HOME_ENTRIES = {
 
 # Safe spots (can't be captured here)
 SAFE_SPOTS = [0, 14, 28, 42]
+# Bit n is set when track position n is a safe spot
+_SAFE_MASK = sum(1 << spot for spot in SAFE_SPOTS)
 
 # Colors list for indexing
 COLORS = [PlayerColor.RED, PlayerColor.BLUE, PlayerColor.GREEN, PlayerColor.YELLOW]
 
+# Per-player lookups indexed by player_id (the player's index into COLORS)
+_START_POSITIONS: Tuple[int, ...] = tuple(START_POSITIONS[color] for color in COLORS)
+_HOME_ENTRIES: Tuple[int, ...] = tuple(HOME_ENTRIES[color] for color in COLORS)
+
+# Zobrist keys for hashing board states. Fixed seed so every engine (and
+# every reload from the database) hashes the same board to the same value.
+_zobrist_rng = random.Random(0x4D617262)
+ZOBRIST_MARBLES = {
+    f"{_COLOR_NAMES[color][0]}{j}": [_zobrist_rng.getrandbits(64)
+                             for _ in range(TRACK_SIZE + HOME_SIZE * len(COLORS) + 1)]
+    for color in COLORS
+    for j in range(MARBLES_PER_PLAYER)
+}  # indexed by position + 1 so the start area (-1) maps to 0
+ZOBRIST_PLAYERS = [_zobrist_rng.getrandbits(64) for _ in COLORS]
+ZOBRIST_DICE = [_zobrist_rng.getrandbits(64) for _ in range(7)]
+
 
-@dataclass
 class Marble:
-    id: str
-    player_id: int
-    color: PlayerColor
-    position: int  # -1 = in start area, 0-55 = on track, 56+ = in home
+    """A player's marble. Its position is read from a packed board byte, so
+    once a GameEngine adopts the marble the engine's board is the only copy."""
+    __slots__ = ("id", "player_id", "color", "home_start", "_board", "_slot")
+
+    def __init__(self, id: str, player_id: int, color: PlayerColor, position: int):
+        self.id = id
+        self.player_id = player_id
+        self.color = color
+        # First home stretch position for this marble's player
+        self.home_start = _HOME_ENTRIES[player_id]
+        # Until an engine adopts it, the marble keeps a one-byte board of its own
+        self._board = bytearray([_pack_marble(player_id, position)])
+        self._slot = 0
+
+    @property
+    def position(self) -> int:
+        """-1 = in start area, 0-55 = on track, 56+ = in home.
+
+        Read-only: marbles move through GameEngine.make_move.
+        """
+        return _UNPACKED_POSITIONS[self._board[self._slot]]
+
+    def __repr__(self) -> str:
+        return (f"Marble(id={self.id!r}, player_id={self.player_id!r}, "
+                f"color={self.color!r}, position={self.position!r})")
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not Marble:
+            return NotImplemented
+        return ((self.id, self.player_id, self.color, self.position) ==
+                (other.id, other.player_id, other.color, other.position))
+
+    __hash__ = None
 
     def is_in_start(self) -> bool:
         return self.position == -1
@@ -56,19 +109,17 @@ class Marble:
         return 0 <= self.position < TRACK_SIZE
 
     def is_in_home(self) -> bool:
-        home_start = HOME_ENTRIES[self.color]
-        return home_start <= self.position < home_start + HOME_SIZE
+        return self.home_start <= self.position < self.home_start + HOME_SIZE
 
     def is_finished(self) -> bool:
         """Marble has reached final home position"""
-        home_start = HOME_ENTRIES[self.color]
-        return self.position == home_start + HOME_SIZE - 1
+        return self.position == self.home_start + HOME_SIZE - 1
 
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "player_id": self.player_id,
-            "color": self.color.value,
+            "color": _COLOR_NAMES[self.color],
             "position": self.position
         }
 
@@ -77,12 +128,12 @@ class Marble:
         return Marble(
             id=data["id"],
             player_id=data["player_id"],
-            color=PlayerColor(data["color"]),
+            color=_COLOR_NAME_TO_ENUM[data["color"]],
             position=data["position"]
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     id: int
     name: str
@@ -90,24 +141,30 @@ class Player:
     is_ai: bool
     ai_difficulty: str = "medium"
     marbles: List[Marble] = field(default_factory=list)
+    # Marbles in home / in start, kept up to date by the engine as they move
+    home_count: int = field(default=0, init=False, repr=False, compare=False)
+    start_count: int = field(default=0, init=False, repr=False, compare=False)
+
+    def recount(self):
+        """Recompute home_count and start_count from the marbles"""
+        self.home_count = sum(m.is_in_home() for m in self.marbles)
+        self.start_count = sum(m.position == -1 for m in self.marbles)
 
     def marbles_home(self) -> int:
         """Count marbles that have finished"""
-        home_start = HOME_ENTRIES[self.color]
-        home_end = home_start + HOME_SIZE
-        return sum(1 for m in self.marbles if home_start <= m.position < home_end)
+        return self.home_count
 
     def marbles_in_start(self) -> int:
-        return sum(1 for m in self.marbles if m.position == -1)
+        return self.start_count
 
     def has_won(self) -> bool:
-        return self.marbles_home() == MARBLES_PER_PLAYER
+        return self.home_count == MARBLES_PER_PLAYER
 
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "name": self.name,
-            "color": self.color.value,
+            "color": _COLOR_NAMES[self.color],
             "is_ai": self.is_ai,
             "ai_difficulty": self.ai_difficulty,
             "marbles_home": self.marbles_home(),
@@ -119,15 +176,16 @@ class Player:
         player = Player(
             id=data["id"],
             name=data["name"],
-            color=PlayerColor(data["color"]),
+            color=_COLOR_NAME_TO_ENUM[data["color"]],
             is_ai=data["is_ai"],
             ai_difficulty=data.get("ai_difficulty", "medium")
         )
         player.marbles = [m for m in marbles if m.player_id == player.id]
+        player.recount()
         return player
 
 
-@dataclass
+@dataclass(slots=True)
 class Move:
     marble_id: str
     from_position: int
@@ -145,17 +203,178 @@ class Move:
         }
 
 
+class MoveTuple(NamedTuple):
+    """Lightweight Move for callers that generate many moves, like the AI"""
+    marble_id: str
+    from_position: int
+    to_position: int
+    is_entering_track: bool
+    captured_marble_id: Optional[str]
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+def _track_position(current: int, dice_value: int, start_pos: int,
+                    home_start: int) -> Optional[int]:
+    """Calculate new position on track, handling home entry"""
+    # Squares until the marble gets back around to its start position.
+    # A marble sitting on its start has a full lap to go.
+    steps_to_start = (start_pos - current) % TRACK_SIZE or TRACK_SIZE
+
+    if dice_value < steps_to_start:
+        return (current + dice_value) % TRACK_SIZE
+
+    if dice_value == steps_to_start:
+        # Exact landing on start, still on track
+        return start_pos
+
+    # We've completed the track, enter home stretch
+    remaining = dice_value - steps_to_start
+    if remaining <= HOME_SIZE:
+        return home_start + remaining - 1
+
+    # Would overshoot home
+    return None
+
+
+# _track_position for every track square, indexed [player_id][dice_value][current]
+_TRACK_TARGETS: Tuple[Tuple[Tuple[Optional[int], ...], ...], ...] = tuple(
+    tuple(
+        tuple(_track_position(current, dice_value, _START_POSITIONS[player_id],
+                              _HOME_ENTRIES[player_id])
+              for current in range(TRACK_SIZE))
+        for dice_value in range(7)
+    )
+    for player_id in range(len(COLORS))
+)
+
+# Packed boards: one byte per marble slot, the owner in the top two bits and
+# a 6-bit location below (0-55 track, 56-59 home stretch, 63 start area)
+_PACKED_START = 0x3F
+
+
+def _pack_marble(owner: int, position: int) -> int:
+    """Encode a marble's owner and position into one byte"""
+    if position == -1:
+        location = _PACKED_START
+    elif position < TRACK_SIZE:
+        location = position
+    else:
+        location = TRACK_SIZE + position - _HOME_ENTRIES[owner]
+    return owner << 6 | location
+
+
+def _unpack_position(code: int) -> int:
+    """Decode the board position from a packed marble byte"""
+    location = code & 0x3F
+    if location == _PACKED_START:
+        return -1
+    if location < TRACK_SIZE:
+        return location
+    return _HOME_ENTRIES[code >> 6] + location - TRACK_SIZE
+
+
+# Packed byte -> position, so decoding a board is one table lookup per slot
+_UNPACKED_POSITIONS = tuple(_unpack_position(code) for code in range(256))
+# The same table as a bytes.translate() map onto signed position bytes
+_UNPACK_TABLE = bytes(position & 0xFF for position in _UNPACKED_POSITIONS)
+
+
+def _valid_moves_kernel(positions: array, owners: array, player_id: int,
+                        dice_value: int) -> List[Tuple[int, int, int, int]]:
+    """Valid moves as (slot, from_position, to_position, captured_slot) tuples.
+
+    Works only on the flat position/owner arrays (captured_slot is -1 when
+    nothing is captured), so it doesn't depend on GameEngine state.
+    """
+    start_pos = _START_POSITIONS[player_id]
+    home_start = _HOME_ENTRIES[player_id]
+    home_end = home_start + HOME_SIZE
+    track_targets = _TRACK_TARGETS[player_id][dice_value]
+
+    moves = []
+    first_slot = player_id * MARBLES_PER_PLAYER
+    for slot in range(first_slot, first_slot + MARBLES_PER_PLAYER):
+        current = positions[slot]
+        if current == -1:
+            # Marble in start area: can only exit on 1 or 6
+            if dice_value != 1 and dice_value != 6:
+                continue
+            new_pos = start_pos
+        elif current < TRACK_SIZE:
+            # Marble on track
+            new_pos = track_targets[current]
+            if new_pos is None:
+                continue
+        elif home_start <= current < home_end:
+            # Marble in home stretch, can't overshoot home
+            new_pos = current + dice_value
+            if new_pos >= home_end:
+                continue
+        else:
+            continue
+
+        # Most target squares are empty; the array scan runs in C
+        captured = -1
+        if new_pos in positions:
+            blocked = False
+            for other, position in enumerate(positions):
+                if position == new_pos:
+                    if owners[other] == player_id:
+                        blocked = True  # Blocked by own marble
+                        break
+                    captured = other
+
+            if blocked:
+                continue
+            # Can't capture on safe spots (or in the home stretch)
+            if new_pos >= TRACK_SIZE or (_SAFE_MASK >> new_pos) & 1:
+                captured = -1
+
+        moves.append((slot, current, new_pos, captured))
+
+    return moves
+
+
+def _valid_moves_packed(packed: bytes, player_id: int,
+                        dice_value: int) -> Tuple[Tuple[int, int, int, int], ...]:
+    """_valid_moves_kernel on a packed board"""
+    positions = array("b", packed.translate(_UNPACK_TABLE))
+    owners = array("b", [code >> 6 for code in packed])
+    return tuple(_valid_moves_kernel(positions, owners, player_id, dice_value))
+
+
+MOVE_CACHE_SIZE = 1 << 16
+
+# Memoized move generation for live games, keyed on the packed board
+_valid_moves_cached = lru_cache(maxsize=MOVE_CACHE_SIZE)(_valid_moves_packed)
+
+
 class GameEngine:
     """Core game logic for Aggravation/Trouble"""
 
     def __init__(self):
         self.players: List[Player] = []
         self.marbles: Dict[str, Marble] = {}
+        # Marble positions and owners as flat int8 arrays indexed by slot,
+        # for the move kernel and the AI, which only need numbers
+        self.owners: array = array("b")
+        self._slot_of: Dict[str, int] = {}
+        self._slot_ids: List[str] = []
+        self._slot_colors: List[str] = []
+        # Marble positions packed one byte per slot. The single source of
+        # truth for the board; also the move cache key.
+        self._packed: bytearray = bytearray()
         self.current_player: int = 0
         self.dice_value: Optional[int] = None
         self.status: str = "waiting"  # waiting, rolling, moving, finished
         self.winner: Optional[int] = None
         self.turn_count: int = 0
+        # Valid moves for the current roll, keyed by (marble_id, to_position)
+        self._pending_moves_index: Dict[Tuple[str, int], Union[Move, MoveTuple]] = {}
+        # Pre-rolled dice values, refilled in bulk by _refill_dice_pool
+        self._dice_pool: List[int] = []
 
     def create_game(self, num_players: int, player_names: List[str],
                     ai_players: List[int] = None, ai_difficulty: str = "medium") -> dict:
@@ -179,7 +398,7 @@ class GameEngine:
 
             # Create 4 marbles per player
             for j in range(MARBLES_PER_PLAYER):
-                marble_id = f"{color.value[0]}{j}"  # e.g., "r0", "r1", "b0"
+                marble_id = f"{_COLOR_NAMES[color][0]}{j}"  # e.g., "r0", "r1", "b0"
                 marble = Marble(
                     id=marble_id,
                     player_id=i,
@@ -191,142 +410,63 @@ class GameEngine:
 
             self.players.append(player)
 
+        self._build_indexes()
+
         self.current_player = 0
         self.dice_value = None
         self.status = "rolling"
         self.winner = None
         self.turn_count = 0
+        self._pending_moves_index = {}
 
         return self.get_state()
 
-    def roll_dice(self) -> Tuple[int, List[Move]]:
+    def roll_dice(self, as_dataclass: bool = True) -> Tuple[int, List[Union[Move, MoveTuple]]]:
         """Roll dice and calculate valid moves"""
         if self.status != "rolling":
             raise ValueError(f"Cannot roll dice in state: {self.status}")
 
-        self.dice_value = random.randint(1, 6)
-        valid_moves = self.get_valid_moves(self.current_player, self.dice_value)
+        while not self._dice_pool:
+            self._refill_dice_pool()
+        self.dice_value = self._dice_pool.pop()
+        valid_moves = self.get_valid_moves(self.current_player, self.dice_value,
+                                           as_dataclass=as_dataclass)
 
         if valid_moves:
             self.status = "moving"
+            self._pending_moves_index = {(m.marble_id, m.to_position): m
+                                         for m in valid_moves}
         else:
             # No valid moves, advance turn
             self._advance_turn(rolled_six=False)
 
         return self.dice_value, valid_moves
 
-    def get_valid_moves(self, player_id: int, dice_value: int) -> List[Move]:
-        """Calculate all valid moves for a player given a dice roll"""
-        player = self.players[player_id]
-        moves = []
-
-        for marble in player.marbles:
-            move = self._get_move_for_marble(marble, dice_value, player)
-            if move:
-                moves.append(move)
-
-        return moves
-
-    def _get_move_for_marble(self, marble: Marble, dice_value: int,
-                              player: Player) -> Optional[Move]:
-        """Calculate valid move for a single marble"""
-
-        # Marble in start area
-        if marble.is_in_start():
-            # Can only exit on 1 or 6
-            if dice_value in [1, 6]:
-                start_pos = START_POSITIONS[player.color]
-                # Check if start position is blocked by own marble
-                if not self._is_blocked_by_own_marble(start_pos, player.id):
-                    captured = self._check_capture(start_pos, player.id)
-                    return Move(
-                        marble_id=marble.id,
-                        from_position=-1,
-                        to_position=start_pos,
-                        is_entering_track=True,
-                        captured_marble_id=captured
-                    )
-            return None
-
-        # Marble on track
-        if marble.is_on_track():
-            new_pos = self._calculate_track_position(marble, dice_value, player)
-            if new_pos is not None:
-                # Check if blocked by own marble
-                if not self._is_blocked_by_own_marble(new_pos, player.id):
-                    captured = self._check_capture(new_pos, player.id) if new_pos < TRACK_SIZE else None
-                    return Move(
-                        marble_id=marble.id,
-                        from_position=marble.position,
-                        to_position=new_pos,
-                        captured_marble_id=captured
-                    )
-            return None
-
-        # Marble in home stretch
-        if marble.is_in_home():
-            home_start = HOME_ENTRIES[player.color]
-            home_pos = marble.position - home_start  # 0-3 within home
-            new_home_pos = home_pos + dice_value
-
-            # Can't overshoot home
-            if new_home_pos < HOME_SIZE:
-                new_pos = home_start + new_home_pos
-                if not self._is_blocked_by_own_marble(new_pos, player.id):
-                    return Move(
-                        marble_id=marble.id,
-                        from_position=marble.position,
-                        to_position=new_pos
-                    )
-            return None
-
-        return None
-
-    def _calculate_track_position(self, marble: Marble, dice_value: int,
-                                   player: Player) -> Optional[int]:
-        """Calculate new position on track, handling home entry"""
-        current = marble.position
-        start_pos = START_POSITIONS[player.color]
-        home_start = HOME_ENTRIES[player.color]
-
-        # Calculate positions to move
-        new_pos = current
-        for _ in range(dice_value):
-            new_pos = (new_pos + 1) % TRACK_SIZE
-
-            # Check for home entry (pass start position coming from behind)
-            # Player enters home when they complete a full loop
-            if new_pos == start_pos:
-                # We've completed the track, enter home stretch
-                remaining = dice_value - ((new_pos - current) % TRACK_SIZE)
-                if remaining > 0 and remaining <= HOME_SIZE:
-                    return home_start + remaining - 1
-                elif remaining == 0:
-                    # Exact landing on start, still on track
-                    return new_pos
-                else:
-                    # Would overshoot home
-                    return None
-
-        return new_pos
-
-    def _is_blocked_by_own_marble(self, position: int, player_id: int) -> bool:
-        """Check if position is occupied by player's own marble"""
-        for marble in self.marbles.values():
-            if marble.player_id == player_id and marble.position == position:
-                return True
-        return False
-
-    def _check_capture(self, position: int, player_id: int) -> Optional[str]:
-        """Check if landing on position captures opponent marble"""
-        # Can't capture on safe spots
-        if position in SAFE_SPOTS:
-            return None
-
-        for marble in self.marbles.values():
-            if marble.player_id != player_id and marble.position == position:
-                return marble.id
-        return None
+    def _refill_dice_pool(self):
+        """Slice one 64-bit random draw into as many dice rolls as it yields"""
+        bits = random.getrandbits(64)
+        for _ in range(64 // 3):
+            value = bits & 0b111
+            bits >>= 3
+            # Reject 6 and 7 so each face stays equally likely
+            if value < 6:
+                self._dice_pool.append(value + 1)
+
+    def get_valid_moves(self, player_id: int, dice_value: int,
+                        as_dataclass: bool = True) -> List[Union[Move, MoveTuple]]:
+        """Calculate all valid moves for a player given a dice roll.
+
+        Pass as_dataclass=False to get MoveTuples instead of Move objects,
+        which are cheaper to build when the moves never leave the server.
+        """
+        slot_ids = self._slot_ids
+        move_type = Move if as_dataclass else MoveTuple
+        return [
+            move_type(slot_ids[slot], from_pos, to_pos, from_pos == -1,
+                      slot_ids[captured] if captured >= 0 else None)
+            for slot, from_pos, to_pos, captured
+            in _valid_moves_cached(bytes(self._packed), player_id, dice_value)
+        ]
 
     def make_move(self, marble_id: str, to_position: int) -> dict:
         """Execute a move"""
@@ -340,26 +480,20 @@ class GameEngine:
         if marble.player_id != self.current_player:
             raise ValueError("Not your marble")
 
-        # Validate move
-        valid_moves = self.get_valid_moves(self.current_player, self.dice_value)
-        matching_move = None
-        for move in valid_moves:
-            if move.marble_id == marble_id and move.to_position == to_position:
-                matching_move = move
-                break
-
+        # Validate move against the moves computed when the dice were rolled
+        matching_move = self._pending_moves_index.get((marble_id, to_position))
         if not matching_move:
             raise ValueError("Invalid move")
 
         # Execute move
         old_position = marble.position
-        marble.position = to_position
+        self._set_position(marble, to_position)
 
         # Handle capture
         captured_marble = None
         if matching_move.captured_marble_id:
             captured = self.marbles[matching_move.captured_marble_id]
-            captured.position = -1  # Send back to start
+            self._set_position(captured, -1)  # Send back to start
             captured_marble = captured.to_dict()
 
         # Check for win
@@ -379,9 +513,44 @@ class GameEngine:
             "extra_turn": self.dice_value == 6 and self.status != "finished"
         }
 
+    @property
+    def positions(self) -> array:
+        """Marble positions indexed by slot, decoded from the packed board"""
+        return array("b", self._packed.translate(_UNPACK_TABLE))
+
+    def _set_position(self, marble: Marble, position: int):
+        """Move a marble, keeping the player's counters in sync"""
+        player = self.players[marble.player_id]
+        if marble.position == -1:
+            player.start_count -= 1
+        elif marble.is_in_home():
+            player.home_count -= 1
+        self._packed[self._slot_of[marble.id]] = _pack_marble(marble.player_id, position)
+        if position == -1:
+            player.start_count += 1
+        elif marble.is_in_home():
+            player.home_count += 1
+
+    def _build_indexes(self):
+        """Build the packed board and slot lookups from the players' marbles"""
+        # Slots are grouped by player: player_id * MARBLES_PER_PLAYER + index
+        marbles = [m for p in self.players for m in p.marbles]
+        self.owners = array("b", [m.player_id for m in marbles])
+        self._slot_of = {m.id: slot for slot, m in enumerate(marbles)}
+        self._slot_ids = [m.id for m in marbles]
+        self._slot_colors = [_COLOR_NAMES[m.color] for m in marbles]
+        self._packed = bytearray(_pack_marble(m.player_id, m.position) for m in marbles)
+        # From here on the marbles read their positions from the engine's board
+        for slot, marble in enumerate(marbles):
+            marble._board = self._packed
+            marble._slot = slot
+        for player in self.players:
+            player.recount()
+
     def _advance_turn(self, rolled_six: bool):
         """Advance to next player's turn"""
         self.turn_count += 1
+        self._pending_moves_index = {}
 
         if rolled_six and self.status != "finished":
             # Same player rolls again
@@ -397,7 +566,12 @@ class GameEngine:
         """Get current game state as JSON-serializable dict"""
         return {
             "players": [p.to_dict() for p in self.players],
-            "marbles": [m.to_dict() for m in self.marbles.values()],
+            # Built straight from the slot arrays rather than Marble.to_dict()
+            "marbles": [
+                {"id": marble_id, "player_id": owner, "color": color, "position": position}
+                for marble_id, owner, color, position
+                in zip(self._slot_ids, self.owners, self._slot_colors, self.positions)
+            ],
             "current_player": self.current_player,
             "dice_value": self.dice_value,
             "status": self.status,
@@ -407,24 +581,42 @@ class GameEngine:
 
     def load_state(self, state: dict):
         """Load game state from dict"""
-        # Recreate marbles
+        # Recreate marbles, grouped by player as we go
         self.marbles = {}
+        by_player: Dict[int, List[Marble]] = {p_data["id"]: [] for p_data in state["players"]}
         for m_data in state["marbles"]:
             marble = Marble.from_dict(m_data)
             self.marbles[marble.id] = marble
+            by_player[marble.player_id].append(marble)
 
-        # Recreate players
+        # Recreate players, each only looking at its own marbles
         self.players = []
         for p_data in state["players"]:
-            player = Player.from_dict(p_data, list(self.marbles.values()))
+            player = Player.from_dict(p_data, by_player[p_data["id"]])
             self.players.append(player)
 
+        self._build_indexes()
+
         self.current_player = state["current_player"]
         self.dice_value = state["dice_value"]
         self.status = state["status"]
         self.winner = state["winner"]
         self.turn_count = state.get("turn_count", 0)
 
+        self._pending_moves_index = {}
+        if self.status == "moving":
+            self._pending_moves_index = {
+                (m.marble_id, m.to_position): m
+                for m in self.get_valid_moves(self.current_player, self.dice_value)
+            }
+
+    def zobrist_hash(self) -> int:
+        """Hash marble positions, current player and dice value"""
+        h = ZOBRIST_PLAYERS[self.current_player] ^ ZOBRIST_DICE[self.dice_value or 0]
+        for marble_id, position in zip(self._slot_ids, self.positions):
+            h ^= ZOBRIST_MARBLES[marble_id][position + 1]
+        return h
+
     def get_current_player(self) -> Player:
         """Get the current player"""
         return self.players[self.current_player]
@@ -432,3 +624,63 @@ class GameEngine:
     def is_ai_turn(self) -> bool:
         """Check if current turn is AI player"""
         return self.players[self.current_player].is_ai
+
+
+def simulate_batch(n_games: int, n_turns: int, num_players: int = 4) -> List[int]:
+    """Simulate many games in lockstep, every player taking its first valid move.
+
+    Each game is just a packed board driven by the move kernel, so
+    boards shared between games (and between turns) hit the same memoized
+    results. The batch memoizes into its own cache, so a large rollout
+    doesn't evict live games' entries. Returns the winner of each game, or
+    -1 if it didn't finish within n_turns.
+    """
+    if num_players < 2 or num_players > 4:
+        raise ValueError("Must have 2-4 players")
+
+    valid_moves = lru_cache(maxsize=MOVE_CACHE_SIZE)(_valid_moves_packed)
+    n_slots = num_players * MARBLES_PER_PLAYER
+    empty_board = bytes(_pack_marble(slot // MARBLES_PER_PLAYER, -1) for slot in range(n_slots))
+    boards = [bytearray(empty_board) for _ in range(n_games)]
+    current = [0] * n_games
+    winners = [-1] * n_games
+    active = list(range(n_games))
+
+    for _ in range(n_turns):
+        if not active:
+            break
+
+        # One dice roll per unfinished game
+        dice_values = random.choices(range(1, 7), k=len(active))
+        still_active = []
+
+        for game, dice_value in zip(active, dice_values):
+            board = boards[game]
+            player_id = current[game]
+            moves = valid_moves(bytes(board), player_id, dice_value)
+
+            if moves:
+                slot, _, to_pos, captured = moves[0]
+                board[slot] = _pack_marble(player_id, to_pos)
+                if captured >= 0:
+                    # Send back to start, keeping the owner bits
+                    board[captured] = (board[captured] & 0xC0) | _PACKED_START
+
+                # Won when every marble's location is in the home stretch
+                first_slot = player_id * MARBLES_PER_PLAYER
+                if all(TRACK_SIZE <= code & 0x3F < TRACK_SIZE + HOME_SIZE
+                       for code in board[first_slot:first_slot + MARBLES_PER_PLAYER]):
+                    winners[game] = player_id
+                    continue
+
+                # Extra turn on 6
+                if dice_value != 6:
+                    current[game] = (player_id + 1) % num_players
+            else:
+                current[game] = (player_id + 1) % num_players
+
+            still_active.append(game)
+
+        active = still_active
+
+    return winners
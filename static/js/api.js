@@ -75,7 +75,7 @@ const GameAPI = {
     },
 
     /**
-     * Execute AI turn
+     * Execute AI turn (runs in the background on the server)
      */
     async aiTurn(gameId) {
         const response = await fetch(`${this.baseUrl}/game/${gameId}/ai-turn`, {
@@ -88,7 +88,27 @@ const GameAPI = {
             throw new Error(error.error || 'Failed to execute AI turn');
         }
 
-        return response.json();
+        return this.waitForAiTurn(gameId);
+    },
+
+    /**
+     * Poll until the background AI turn has finished
+     */
+    async waitForAiTurn(gameId) {
+        while (true) {
+            const response = await fetch(`${this.baseUrl}/game/${gameId}/ai-status`);
+
+            if (!response.ok) {
+                const error = await response.json();
+                throw new Error(error.error || 'Failed to execute AI turn');
+            }
+
+            if (response.status !== 202) {
+                return response.json();
+            }
+
+            await new Promise(resolve => setTimeout(resolve, 100));
+        }
     },
 
     /**
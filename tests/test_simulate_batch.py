@@ -0,0 +1,47 @@
+"""
+simulate_batch should play exactly the games GameEngine would play
+"""
+import random
+import unittest
+
+from game_engine import GameEngine, simulate_batch
+
+
+def play_with_engine(seed: int, n_turns: int, num_players: int) -> int:
+    """Replay simulate_batch(1, ...) through GameEngine, first valid move each turn"""
+    random.seed(seed)
+    engine = GameEngine()
+    engine.create_game(num_players, [])
+
+    for _ in range(n_turns):
+        # simulate_batch draws one die per active game per turn
+        engine._dice_pool = random.choices(range(1, 7), k=1)
+        _, valid_moves = engine.roll_dice()
+        if valid_moves:
+            engine.make_move(valid_moves[0].marble_id, valid_moves[0].to_position)
+            if engine.status == "finished":
+                return engine.winner
+
+    return -1
+
+
+class SimulateBatchTest(unittest.TestCase):
+    def test_matches_game_engine(self):
+        for num_players in (2, 3, 4):
+            for seed in range(50):
+                random.seed(seed)
+                winners = simulate_batch(1, 3000, num_players)
+                self.assertEqual(winners, [play_with_engine(seed, 3000, num_players)],
+                                 f"seed {seed}, {num_players} players")
+
+    def test_unfinished_games_have_no_winner(self):
+        self.assertEqual(simulate_batch(5, 1), [-1] * 5)
+
+    def test_rejects_bad_player_counts(self):
+        for num_players in (1, 5):
+            with self.assertRaisesRegex(ValueError, "Must have 2-4 players"):
+                simulate_batch(1, 10, num_players)
+
+
+if __name__ == "__main__":
+    unittest.main()
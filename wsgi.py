@@ -0,0 +1,6 @@
+"""
+WSGI entry point for production servers (gunicorn)
+"""
+from app import app
+
+application = app